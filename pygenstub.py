@@ -17,43 +17,57 @@
 
 import ast
 import builtins
+import hashlib
 import inspect
 import logging
 import os
 import re
 import sys
 import textwrap
+import typing
 from argparse import ArgumentParser
-from bisect import bisect
-from contextlib import redirect_stdout
-from importlib import import_module
-from io import StringIO
+from functools import lru_cache
+from importlib.util import decode_source, find_spec
+from itertools import repeat
 from pathlib import Path
-from pkgutil import get_loader, walk_packages
-
-from docutils.core import publish_doctree
 
 
 __version__ = "2.0.1"  # sig: str
 
 
-_BUILTIN_TYPES = {k for k, t in builtins.__dict__.items() if isinstance(t, type)}
-_BUILTIN_TYPES.add("None")
+_BUILTIN_TYPES = frozenset(
+    [k for k, t in builtins.__dict__.items() if isinstance(t, type)] + ["None"]
+)
+_TYPING_NAMES = frozenset(dir(typing))
 
 SIG_FIELD = "sig"
+_SIG_MARKER = ":" + SIG_FIELD + ":"
 _SIG_COMMENT = "# sig:"
 
-_SUPPORTED_DECORATORS = {"property", "staticmethod", "classmethod"}
+# node types that are or can contain statements
+_STATEMENT_NODES = (ast.stmt, ast.excepthandler) + (
+    (ast.match_case,) if hasattr(ast, "match_case") else ()
+)
+
+_SUPPORTED_DECORATORS = frozenset({"property", "staticmethod", "classmethod"})
 
 MAX_LINE_LENGTH = 79
 INDENT = 4 * " "
 
 _EDIT_WARNING = "THIS FILE IS AUTOMATICALLY GENERATED, DO NOT EDIT."
+_STUB_SUFFIX = ".pyi"
+_EDIT_WARNING_BYTES = ("# %s\n\n" % _EDIT_WARNING).encode("utf-8")
 
-_RE_QUALIFIED_TYPES = re.compile(r"\w+(?:\.\w+)*")
+_RE_QUALIFIED_TYPES = re.compile(r"\b(?!\d)\w+(?:\.\w+)*")
 _RE_COMMENT_IN_STRING = re.compile(r"""['"]\s*%(text)s\s*.*['"]""" % {"text": _SIG_COMMENT})
 _RE_SIG_ARROW = re.compile(r"\s+->\s+")
-_RE_SIG_ALIAS = re.compile(r"\s*#\s+sigalias:\s+([^\s]*)\s+=\s+(.*)\s*$")
+_RE_TYPE_DELIMITER = re.compile(r"[\[\],]")
+_RE_SIG_ALIAS = re.compile(
+    r"^[^\S\n]*#[^\S\n]+sigalias:[^\S\n]+(\S*)[^\S\n]+=[^\S\n]+(.*?)[^\S\n]*$", re.M
+)
+_RE_SIG_LINE = re.compile(r"^%s +(\S(?:.*\S)?)$(?!\n\s)" % _SIG_MARKER, re.M)
+_RE_FIELD_MARKER = re.compile(r":[^\s:](?:[^:]*[^\s:])?:(?: |$)")
+_RE_ADORNMENT = re.compile(r"^([^\w\s])\1* *$", re.M)
 
 
 _logger = logging.getLogger(__name__)
@@ -64,6 +78,73 @@ _logger = logging.getLogger(__name__)
 ############################################################
 
 
+@lru_cache(maxsize=None)
+def _get_publisher():
+    """Get the reusable publisher for parsing docstrings into doctrees.
+
+    The publisher is only created when a docstring needs to be parsed by docutils.
+
+    :sig: () -> docutils.core.Publisher
+    :return: Publisher with settings already processed.
+    """
+    from docutils.core import Publisher
+    from docutils.io import NullOutput, StringInput
+    from docutils.parsers.rst import Parser
+    from docutils.readers.standalone import Reader
+    from docutils.writers.null import Writer
+
+    publisher = Publisher(
+        reader=Reader(),
+        parser=Parser(),
+        writer=Writer(),
+        source_class=StringInput,
+        destination_class=NullOutput,
+    )
+    publisher.process_programmatic_settings(None, {"report_level": 5}, None)
+    publisher.set_destination()
+    return publisher
+
+
+def _scan_signature(docstring):
+    """Find a single line signature field without parsing the docstring.
+
+    This only handles the common layout where the signature is in a field list
+    following the description, and gives up on anything that might get
+    interpreted differently by docutils (sections, docinfo, continuation lines).
+
+    :sig: (str) -> Optional[str]
+    :param docstring: Docstring to scan for the signature.
+    :return: Signature, or ``None`` if the docstring needs to be parsed.
+    """
+    if ("\t" in docstring) or (docstring.count(_SIG_MARKER) != 1):
+        return None
+    # the signature must not be followed by continuation or blank lines
+    match = _RE_SIG_LINE.search(docstring)
+    if (match is None) or (_RE_ADORNMENT.search(docstring) is not None):
+        return None
+
+    # a leading field list would be turned into docinfo
+    if not docstring.lstrip()[:1].isalnum():
+        return None
+
+    # the field list must start after a blank line, and not in a literal block
+    first = None
+    preceding = docstring[: match.start()].splitlines()
+    for i in range(len(preceding) - 1, -1, -1):
+        line = preceding[i]
+        if line.strip() == "":
+            if "\n".join(preceding[:i]).rstrip().endswith("::"):
+                return None
+            break
+        if (not line.startswith(" ")) and (_RE_FIELD_MARKER.match(line) is None):
+            return None
+        first = line
+    else:
+        return None
+    return match.group(1) if (first is None) or (not first.startswith(" ")) else None
+
+
+@lru_cache(maxsize=4096)
 def extract_signature(docstring):
     """Extract the signature from a docstring.
 
@@ -72,7 +153,17 @@ def extract_signature(docstring):
     :return: Signature, or ``None`` if no signature found.
     :raise ValueError: When docstring contains multiple signature fields.
     """
-    root = publish_doctree(docstring, settings_overrides={"report_level": 5})
+    if _SIG_MARKER not in docstring:
+        return None
+
+    signature = _scan_signature(docstring)
+    if signature is not None:
+        return signature
+
+    publisher = _get_publisher()
+    publisher.set_source(docstring)
+    publisher.publish()
+    root = publisher.document
     sig_fields = [
         field
         for node in root.children
@@ -101,33 +192,28 @@ def _split_types(decl):
         return []
 
     # only consider the top level commas, ignore the ones in []
-    commas = []
+    types = []
+    last_pos = 0
     bracket_depth = 0
-    for pos, char in enumerate(decl):
-        if (char == ",") and (bracket_depth == 0):
-            commas.append(pos)
-        elif char == "[":
+    for match in _RE_TYPE_DELIMITER.finditer(decl):
+        char = match.group()
+        if char == "[":
             bracket_depth += 1
         elif char == "]":
             bracket_depth -= 1
-
-    types = []
-    last_pos = 0
-    for pos in commas:
-        types.append(decl[last_pos:pos].strip())
-        last_pos = pos + 1
-    else:
-        types.append(decl[last_pos:].strip())
+        elif bracket_depth == 0:
+            pos = match.start()
+            types.append(decl[last_pos:pos].strip())
+            last_pos = pos + 1
+    types.append(decl[last_pos:].strip())
     return types
 
 
-def parse_signature(signature):
-    """Parse input and return parameter types from a signature.
-
-    This will also collect the types that are required by any of the input
-    and return types.
+@lru_cache(maxsize=4096)
+def _parse_signature(signature):
+    """Parse a signature into immutable parts that can be shared between calls.
 
-    :sig: (str) -> Tuple[Optional[List[str]], str, Set[str]]
+    :sig: (str) -> Tuple[Optional[Tuple[str, ...]], str, FrozenSet[str]]
     :param signature: Signature to parse.
     :return: Input parameter types, return type, and all required types.
     :raise ValueError: When signature cannot be correctly parsed.
@@ -143,48 +229,74 @@ def parse_signature(signature):
         if (lhs[0] != "(") or (lhs[-1] != ")"):
             raise ValueError("missing parentheses around parameter list in signature")
         csv = lhs[1:-1].strip()  # remove the parentheses around the parameter type list
-        param_types = _split_types(csv)
-    requires = set(_RE_QUALIFIED_TYPES.findall(signature))
+        param_types = tuple(_split_types(csv))
+    requires = frozenset(_RE_QUALIFIED_TYPES.findall(signature))
     return param_types, return_type, requires
 
 
+def parse_signature(signature):
+    """Parse input and return parameter types from a signature.
+
+    This will also collect the types that are required by any of the input
+    and return types.
+
+    :sig: (str) -> Tuple[Optional[List[str]], str, Set[str]]
+    :param signature: Signature to parse.
+    :return: Input parameter types, return type, and all required types.
+    :raise ValueError: When signature cannot be correctly parsed.
+    """
+    param_types, return_type, requires = _parse_signature(signature)
+    if param_types is not None:
+        param_types = list(param_types)
+    return param_types, return_type, set(requires)
+
+
 ############################################################
 # PRINTING UTILITIES
 ############################################################
 
 
-def print_import_from(mod, names, *, indent="", **config):
-    """Print an "import ... from ..." line.
+def get_import_from(mod, names, *, indent="", **config):
+    """Get the lines of an "import ... from ..." statement.
 
-    :sig: (str, Set[str], str, Dict[str, Any]) -> None
+    :sig: (str, Iterable[str], str, Dict[str, Any]) -> Iterator[str]
     :param mod: Name of module to import the names from.
-    :param names: Names to import.
+    :param names: Names to import, renamed ones are imported in the given order.
     :param indent: Indentation for generated lines.
     :param config: Configuration settings.
+    :return: Lines of import statement.
     """
     regular = sorted(name for name in names if "::" not in name)
     renamed = [name for name in names if "::" in name]
 
     if len(regular) > 0:
-        line = "from %(mod)s import %(names)s" % {
-            "mod": mod,
-            "names": ", ".join(regular),
-        }
+        line = f"from {mod} import {', '.join(regular)}"
         if len(line) <= config.get("max_line_length", MAX_LINE_LENGTH):
-            print(indent, line, sep="")
+            yield indent + line
         else:
-            line = "from %(mod)s import (" % {"mod": mod}
-            print(indent, line, sep="")
+            yield f"{indent}from {mod} import ("
             for name in regular:
-                print(indent + INDENT, name, ",", sep="")
-            print(indent, ")", sep="")
+                yield indent + INDENT + name + ","
+            yield indent + ")"
         if len(renamed) > 0:
-            print()
+            yield ""
 
     for as_name in renamed:
-        new, old = as_name.split("::")
-        line = "from %(mod)s import %(old)s as %(new)s" % {"mod": mod, "old": old, "new": new}
-        print(indent, line, sep="")
+        new, _, old = as_name.partition("::")
+        yield f"{indent}from {mod} import {old} as {new}"
+
+
+def print_import_from(mod, names, *, indent="", **config):
+    """Print an "import ... from ..." line.
+
+    :sig: (str, Set[str], str, Dict[str, Any]) -> None
+    :param mod: Name of module to import the names from.
+    :param names: Names to import.
+    :param indent: Indentation for generated lines.
+    :param config: Configuration settings.
+    """
+    for line in get_import_from(mod, names, indent=indent, **config):
+        print(line)
 
 
 ############################################################
@@ -221,23 +333,22 @@ class StubNode:
         The stub code for a node consists of the type annotations of its variables,
         followed by the prototypes of its functions/methods and classes.
 
-        :sig: () -> List[str]
+        :sig: () -> Iterator[str]
         :return: Lines of stub code for this node.
         """
-        stub = []
-        variables = [n for n in self.children if isinstance(n, VariableNode)]
-        nonvariables = [n for n in self.children if not isinstance(n, VariableNode)]
+        variables, nonvariables = [], []
+        for child in self.children:
+            (variables if isinstance(child, VariableNode) else nonvariables).append(child)
         for child in variables:
-            stub.extend(child.get_code())
+            yield from child.get_code()
         if (
             (len(variables) > 0)
             and (len(nonvariables) > 0)
             and (not isinstance(self, ClassNode))
         ):
-            stub.append("")
+            yield ""
         for child in nonvariables:
-            stub.extend(child.get_code())
-        return stub
+            yield from child.get_code()
 
 
 class VariableNode(StubNode):
@@ -257,10 +368,10 @@ class VariableNode(StubNode):
     def get_code(self):
         """Get the type annotation for this variable.
 
-        :sig: () -> List[str]
+        :sig: () -> Iterator[str]
         :return: Lines of stub code for this variable.
         """
-        return ["%(n)s: %(t)s" % {"n": self.name, "t": self.type_}]
+        yield f"{self.name}: {self.type_}"
 
 
 class FunctionNode(StubNode):
@@ -288,45 +399,33 @@ class FunctionNode(StubNode):
     def get_code(self):
         """Get the stub code for this function.
 
-        :sig: () -> List[str]
+        :sig: () -> Iterator[str]
         :return: Lines of stub code for this function.
         """
-        stub = []
-
         for deco in self.decorators:
             if (deco in _SUPPORTED_DECORATORS) or deco.endswith(".setter"):
-                stub.append("@" + deco)
-
-        parameters = []
-        for name, type_, has_default in self.parameters:
-            decl = "%(n)s%(t)s%(d)s" % {
-                "n": name,
-                "t": ": " + type_ if type_ else "",
-                "d": " = ..." if has_default else "",
-            }
-            parameters.append(decl)
-
-        slots = {
-            "a": "async " if self.async_ else "",
-            "n": self.name,
-            "p": ", ".join(parameters),
-            "r": self.rtype,
-        }
+                yield "@" + deco
+
+        parameters = [
+            f"{name}{': ' + type_ if type_ else ''}{' = ...' if has_default else ''}"
+            for name, type_, has_default in self.parameters
+        ]
+        params = ", ".join(parameters)
+        head = f"{'async ' if self.async_ else ''}def {self.name}("
+        tail = f") -> {self.rtype}: ..."
 
-        prototype = "%(a)sdef %(n)s(%(p)s) -> %(r)s: ..." % slots
+        prototype = head + params + tail
         if len(prototype) <= MAX_LINE_LENGTH:
-            stub.append(prototype)
-        elif len(INDENT + slots["p"]) <= MAX_LINE_LENGTH:
-            stub.append("%(a)sdef %(n)s(" % slots)
-            stub.append(INDENT + slots["p"])
-            stub.append(") -> %(r)s: ..." % slots)
+            yield prototype
+        elif len(INDENT) + len(params) <= MAX_LINE_LENGTH:
+            yield head
+            yield INDENT + params
+            yield tail
         else:
-            stub.append("%(a)sdef %(n)s(" % slots)
+            yield head
             for param in parameters:
-                stub.append(INDENT + param + ",")
-            stub.append(") -> %(r)s: ..." % slots)
-
-        return stub
+                yield INDENT + param + ","
+            yield tail
 
 
 class ClassNode(StubNode):
@@ -348,36 +447,53 @@ class ClassNode(StubNode):
     def get_code(self):
         """Get the stub code for this class.
 
-        :sig: () -> List[str]
+        :sig: () -> Iterator[str]
         :return: Lines of stub code for this class.
         """
-        stub = []
-        bases = ("(" + ", ".join(self.bases) + ")") if len(self.bases) > 0 else ""
-        slots = {"n": self.name, "b": bases}
+        bases = f"({', '.join(self.bases)})" if len(self.bases) > 0 else ""
         if len(self.children) == 0:
-            stub.append("class %(n)s%(b)s: ..." % slots)
+            yield f"class {self.name}{bases}: ..."
         else:
-            stub.append("class %(n)s%(b)s:" % slots)
-            super_code = super().get_code()
-            for line in super_code:
-                stub.append(INDENT + line)
-        return stub
+            yield f"class {self.name}{bases}:"
+            for line in super().get_code():
+                yield INDENT + line
 
 
-def get_aliases(lines):
+def get_aliases(source):
     """Get the type aliases in the source.
 
-    :sig: (Sequence[str]) -> Dict[str, str]
-    :param lines: Lines of the source code.
+    :sig: (str) -> Dict[str, str]
+    :param source: Source code to get the aliases from.
     :return: Aliases and their their definitions.
     """
-    aliases = {}
-    for line in lines:
-        match = _RE_SIG_ALIAS.match(line)
-        if match:
-            alias, signature = match.groups()
-            aliases[alias] = signature
-    return aliases
+    if "sigalias:" not in source:
+        return {}
+    return dict(match.groups() for match in _RE_SIG_ALIAS.finditer(source))
+
+
+def get_signature(node):
+    """Get the signature of a definition from its docstring.
+
+    :sig: (Union[ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef]) -> Optional[str]
+    :param node: Node to get the signature of.
+    :return: Signature, or ``None`` if no signature found.
+    """
+    docstring = ast.get_docstring(node, clean=False)
+    if (docstring is None) or (_SIG_MARKER not in docstring):
+        return None
+    return extract_signature(inspect.cleandoc(docstring))
+
+
+def _get_dotted_name(node):
+    """Get the dotted name of a name or an attribute chain.
+
+    :sig: (Union[ast.Name, ast.Attribute]) -> str
+    :param node: Node to get the name of.
+    :return: Name, including the names of the enclosing attributes.
+    """
+    if isinstance(node, ast.Attribute):
+        return _get_dotted_name(node.value) + "." + node.attr
+    return node.id
 
 
 class StubGenerator(ast.NodeVisitor):
@@ -396,12 +512,21 @@ class StubGenerator(ast.NodeVisitor):
 
         self.imported_namespaces = {}  # sig: Dict[str, str]
         self.imported_names = {}  # sig: Dict[str, str]
+        self._imported_locals = {}  # sig: Dict[str, str]
+        self._namespace_aliases = {}  # sig: Dict[str, str]
         self.defined_types = set()  # sig: Set[str]
         self.required_types = set()  # sig: Set[str]
+        self.module_vars = set()  # sig: Set[str]
         self.aliases = {}  # sig: Dict[str, str]
 
-        self._parents = [self.root]  # sig: List[StubNode]
-        self._code_lines = source.splitlines()  # sig: List[str]
+        self._parent = self.root  # sig: StubNode
+        self._source = source  # sig: str
+        self._has_sig_comments = _SIG_COMMENT in source  # sig: bool
+        self._line_starts = None  # sig: Optional[List[int]]
+        self._visitors = {}  # sig: Dict[type, Callable[[ast.AST], None]]
+        for name in dir(self):
+            if name.startswith("visit_"):
+                self._visitors[getattr(ast, name[6:])] = getattr(self, name)
 
         self.collect_aliases()
 
@@ -413,47 +538,82 @@ class StubGenerator(ast.NodeVisitor):
 
         :sig: () -> None
         """
-        self.aliases = get_aliases(self._code_lines)
+        self.aliases = get_aliases(self._source)
         for alias, signature in self.aliases.items():
-            _, _, requires = parse_signature(signature)
+            _, _, requires = _parse_signature(signature)
             self.required_types |= requires
             self.defined_types |= {alias}
 
+    def get_line(self, lineno):
+        """Get a line of the source code.
+
+        :sig: (int) -> str
+        :param lineno: Number of line to get, starting from 1.
+        :return: Line without the line terminator.
+        """
+        if self._line_starts is None:
+            self._line_starts = [0]
+            self._line_starts.extend(m.end() for m in re.finditer("\n", self._source))
+        start = self._line_starts[lineno - 1]
+        end = self._source.find("\n", start)
+        return self._source[start:end] if end >= 0 else self._source[start:]
+
+    def visit(self, node):
+        """Visit a node using the visitor method for its type."""
+        visitor = self._visitors.get(type(node))
+        if visitor is not None:
+            visitor(node)
+        else:
+            self.generic_visit(node)
+
+    def generic_visit(self, node):
+        """Visit the child nodes of a node that can contain statements.
+
+        Expressions can not contain imports, assignments, or definitions,
+        so they are not walked.
+        """
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, _STATEMENT_NODES):
+                self.visit(child)
+
     def visit_Import(self, node):
         """Visit an import node."""
-        line = self._code_lines[node.lineno - 1]
-        module_name = line.split("import")[0].strip()
         for name in node.names:
             imported_name = name.name
             if name.asname:
                 imported_name = name.asname + "::" + imported_name
-            self.imported_namespaces[imported_name] = module_name
+                self._namespace_aliases[name.asname] = name.name
+            self.imported_namespaces[imported_name] = name.name
 
     def visit_ImportFrom(self, node):
         """Visit an from-import node."""
-        line = self._code_lines[node.lineno - 1]
-        module_name = line.split("from")[1].split("import")[0].strip()
+        module_name = "." * node.level + (node.module if node.module is not None else "")
         for name in node.names:
             imported_name = name.name
             if name.asname:
                 imported_name = name.asname + "::" + imported_name
             self.imported_names[imported_name] = module_name
+            self._imported_locals[imported_name] = name.asname or name.name
 
     def visit_Assign(self, node):
         """Visit an assignment node."""
-        line = self._code_lines[node.lineno - 1]
-        if _SIG_COMMENT in line:
-            line = _RE_COMMENT_IN_STRING.sub("", line)
-
-        if (_SIG_COMMENT not in line) and (not self.generic):
+        pos = -1
+        if self._has_sig_comments:
+            line = self.get_line(node.lineno)
+            pos = line.find(_SIG_COMMENT)
+            if (pos > 0) and (("'" in line[:pos]) or ('"' in line[:pos])):
+                line = _RE_COMMENT_IN_STRING.sub("", line)
+                pos = line.find(_SIG_COMMENT)
+
+        if (pos < 0) and (not self.generic):
             return
 
-        if _SIG_COMMENT in line:
+        if pos >= 0:
             _, signature = line.split(_SIG_COMMENT)
-            _, return_type, requires = parse_signature(signature)
+            _, return_type, requires = _parse_signature(signature)
             self.required_types |= requires
 
-        parent = self._parents[-1]
+        parent = self._parent
         for var in node.targets:
             if isinstance(var, ast.Name):
                 name, p = var.id, parent
@@ -472,6 +632,8 @@ class StubGenerator(ast.NodeVisitor):
                     self.required_types.add(return_type)
                 stub_node = VariableNode(name, return_type)
                 p.add_child(stub_node)
+                if p is self.root:
+                    self.module_vars.add(name)
 
     def get_function_node(self, node):
         """Process a function node.
@@ -482,18 +644,17 @@ class StubGenerator(ast.NodeVisitor):
         """
         decorators = []
         for d in node.decorator_list:
-            if hasattr(d, "id"):
+            if isinstance(d, ast.Name):
                 decorators.append(d.id)
-            elif hasattr(d, "func"):
+            elif isinstance(d, ast.Call):
                 decorators.append(d.func.id)
-            elif hasattr(d, "value"):
-                decorators.append(d.value.id + "." + d.attr)
+            elif isinstance(d, ast.Attribute):
+                decorators.append(_get_dotted_name(d))
 
-        docstring = ast.get_docstring(node)
-        signature = extract_signature(docstring) if docstring is not None else None
+        signature = get_signature(node)
 
         if signature is None:
-            parent = self._parents[-1]
+            parent = self._parent
             if isinstance(parent, ClassNode) and (node.name == "__init__"):
                 signature = parent.signature
 
@@ -507,8 +668,8 @@ class StubGenerator(ast.NodeVisitor):
             param_types, rtype, requires = ["Any"] * n_args, "Any", {"Any"}
         else:
             _logger.debug("parsing signature for %s", node.name)
-            input_types, rtype, requires = parse_signature(signature)
-            param_types = input_types if input_types is not None else []
+            input_types, rtype, requires = _parse_signature(signature)
+            param_types = list(input_types) if input_types is not None else []
 
         # TODO: only in classes
         if ((n_args > 0) and (param_names[0] == "self")) or (
@@ -525,7 +686,7 @@ class StubGenerator(ast.NodeVisitor):
 
         self.required_types |= requires
 
-        kwonly_args = getattr(node.args, "kwonlyargs", [])
+        kwonly_args = node.args.kwonlyargs
         if len(kwonly_args) > 0:
             param_names.extend([arg.arg for arg in kwonly_args])
             if signature is None:
@@ -544,13 +705,11 @@ class StubGenerator(ast.NodeVisitor):
         if len(param_types) != len(param_names):
             raise ValueError("Parameter names and types don't match: " + node.name)
 
-        param_locs = [(a.lineno, a.col_offset) for a in (node.args.args + kwonly_args)]
-        param_defaults = {
-            bisect(param_locs, (d.lineno, d.col_offset)) - 1 for d in node.args.defaults
-        }
+        # defaults belong to the last positional parameters
+        n_defaults = len(node.args.defaults)
+        param_defaults = set(range(max(n_args - n_defaults, 0), n_args))
 
-        kwonly_defaults = getattr(node.args, "kw_defaults", [])
-        for i, d in enumerate(kwonly_defaults):
+        for i, d in enumerate(node.args.kw_defaults):
             if d is not None:
                 param_defaults.add(n_args + i)
 
@@ -565,11 +724,11 @@ class StubGenerator(ast.NodeVisitor):
         stub_node = FunctionNode(
             node.name, parameters=params, rtype=rtype, decorators=decorators
         )
-        self._parents[-1].add_child(stub_node)
+        self._parent.add_child(stub_node)
 
-        self._parents.append(stub_node)
+        self._parent = stub_node
         self.generic_visit(node)
-        del self._parents[-1]
+        self._parent = stub_node.parent
         return stub_node
 
     def visit_FunctionDef(self, node):
@@ -588,27 +747,16 @@ class StubGenerator(ast.NodeVisitor):
         """Visit a class node."""
         self.defined_types.add(node.name)
 
-        bases = []
-        for n in node.bases:
-            base_parts = []
-            while True:
-                if not isinstance(n, ast.Attribute):
-                    base_parts.append(n.id)
-                    break
-                else:
-                    base_parts.append(n.attr)
-                n = n.value
-            bases.append(".".join(base_parts[::-1]))
-        self.required_types |= set(bases)
+        bases = [_get_dotted_name(n) for n in node.bases]
+        self.required_types.update(bases)
 
-        docstring = ast.get_docstring(node)
-        signature = extract_signature(docstring) if docstring is not None else None
+        signature = get_signature(node)
         stub_node = ClassNode(node.name, bases=bases, signature=signature)
-        self._parents[-1].add_child(stub_node)
+        self._parent.add_child(stub_node)
 
-        self._parents.append(stub_node)
+        self._parent = stub_node
         self.generic_visit(node)
-        del self._parents[-1]
+        self._parent = stub_node.parent
 
     def analyze_types(self):
         """Scan required types and determine type groups.
@@ -627,14 +775,15 @@ class StubGenerator(ast.NodeVisitor):
         _logger.debug("qualified types: %s", qualified_types)
         needed_types -= qualified_types
 
-        module_vars = {name for name in self.root.children if isinstance(name, VariableNode)}
-        _logger.debug("module variables: %s", module_vars)
+        _logger.debug("module variables: %s", self.module_vars)
 
         needed_modules = {
-            name[: name.rfind(".")] for name in qualified_types if name not in module_vars
+            name[: name.rfind(".")]
+            for name in qualified_types
+            if name.partition(".")[0] not in self.module_vars
         }
 
-        imported_names = {name.split("::")[0] for name in self.imported_names}
+        imported_names = set(self._imported_locals.values())
         imported_used = imported_names & (needed_types | needed_modules)
         if len(imported_used) > 0:
             _logger.debug("used imported types: %s", imported_used)
@@ -646,8 +795,7 @@ class StubGenerator(ast.NodeVisitor):
             _logger.debug("needed modules: %s", needed_modules)
             report["modules"] = needed_modules
 
-        typing_mod = __import__("typing")
-        typing_types = {name for name in needed_types if hasattr(typing_mod, name)}
+        typing_types = needed_types & _TYPING_NAMES
         if len(typing_types) > 0:
             _logger.debug("types from typing module: %s", typing_types)
             report["typing"] = typing_types
@@ -657,10 +805,11 @@ class StubGenerator(ast.NodeVisitor):
             raise ValueError("unresolved types: " + ", ".join(needed_types))
         return report
 
-    def print_stub(self):
-        """Print the stub code for this source.
+    def get_code(self):
+        """Get the stub code for this source.
 
-        :sig: () -> None
+        :sig: () -> Iterator[str]
+        :return: Lines of stub code for this source.
         """
         types = self.analyze_types()
 
@@ -668,64 +817,88 @@ class StubGenerator(ast.NodeVisitor):
 
         typing_types = types.get("typing")
         if typing_types is not None:
-            print_import_from("typing", typing_types)
+            yield from get_import_from("typing", typing_types)
             started = True
 
         imported_types = types.get("imported")
         if imported_types is not None:
             if started:
-                print()
-            # preserve the import order in the source file
-            for name in self.imported_names:
-                if name.split("::")[0] in imported_types:
-                    print_import_from(self.imported_names[name], {name})
+                yield ""
+            # preserve the module order in the source file
+            mod_names = {}
+            for name, local_name in self._imported_locals.items():
+                if local_name in imported_types:
+                    plain, renamed = mod_names.setdefault(self.imported_names[name], ([], []))
+                    (renamed if "::" in name else plain).append(name)
+            for mod, (plain, renamed) in mod_names.items():
+                # no blank line between the plain and the renamed imports of a module
+                if len(plain) > 0:
+                    yield from get_import_from(mod, plain)
+                if len(renamed) > 0:
+                    yield from get_import_from(mod, renamed)
             started = True
 
         needed_modules = types.get("modules")
         if needed_modules is not None:
             if started:
-                print()
-            as_names = {n.split("::")[0]: n for n in self.imported_namespaces if "::" in n}
+                yield ""
             for module_ in sorted(needed_modules):
-                if module_ in as_names:
-                    a, n = as_names[module_].split("::")
-                    print("import " + n + " as " + a)
+                if module_ in self._namespace_aliases:
+                    yield "import " + self._namespace_aliases[module_] + " as " + module_
                 else:
-                    print("import " + module_)
+                    yield "import " + module_
             started = True
 
         if len(self.aliases) > 0:
             if started:
-                print()
+                yield ""
             for alias, signature in self.aliases.items():
-                print("%s = %s" % (alias, signature))
+                yield f"{alias} = {signature}"
             started = True
 
         if started:
-            print()
+            yield ""
+        # separate classes with bodies, and functions following a class
         stub_lines = self.root.get_code()
-        n_lines = len(stub_lines)
-        for line_no in range(n_lines):
-            prev_line = stub_lines[line_no - 1] if line_no > 0 else None
-            line = stub_lines[line_no]
-            next_line = stub_lines[line_no + 1] if line_no < (n_lines - 1) else None
-            if (
-                line.startswith("class ")
-                and (prev_line is not None)
-                and (
-                    (not prev_line.startswith("class "))
-                    or (next_line and next_line.startswith(" "))
-                )
-            ):
-                print()
-            if (
-                line.startswith("def ")
-                and (prev_line is not None)
-                and (prev_line.startswith((" ", "class ")))
-            ):
-                print()
+        prev_line, line = None, next(stub_lines, None)
+        while line is not None:
+            next_line = next(stub_lines, None)
+            if prev_line is not None:
+                if line.startswith("class "):
+                    if (not prev_line.startswith("class ")) or (
+                        (next_line is not None) and next_line.startswith(" ")
+                    ):
+                        yield ""
+                elif line.startswith("def ") and prev_line.startswith((" ", "class ")):
+                    yield ""
+            yield line
+            prev_line, line = line, next_line
+
+    def print_stub(self):
+        """Print the stub code for this source.
+
+        :sig: () -> None
+        """
+        for line in self.get_code():
             print(line)
-            line_no += 1
+
+
+def _may_have_stub(source):
+    """Check whether a source code might produce a non-generic stub.
+
+    Sources without any signatures, aliases, or classes produce empty stubs.
+    Since this is a textual check, it can give false positives.
+
+    :sig: (str) -> bool
+    :param source: Source code to check.
+    :return: Whether stub generation is needed.
+    """
+    return (
+        (_SIG_MARKER in source)
+        or (_SIG_COMMENT in source)
+        or ("sigalias:" in source)
+        or ("class" in source)
+    )
 
 
 def get_stub(source, *, generic=False):
@@ -735,12 +908,15 @@ def get_stub(source, *, generic=False):
     :param source: Source code to generate the stub for.
     :param generic: Whether to produce generic stubs.
     :return: Generated stub code.
+    :raise SyntaxError: When source code can not be parsed. Unless generic stubs
+        are requested, sources without any signatures, aliases, or classes
+        are not parsed and produce an empty stub without raising.
+    :raise ValueError: When signatures or types can not be resolved.
     """
+    if (not generic) and (not _may_have_stub(source)):
+        return ""
     generator = StubGenerator(source, generic=generic)
-    out = StringIO()
-    with redirect_stdout(out):
-        generator.print_stub()
-    return out.getvalue()
+    return "".join(line + "\n" for line in generator.get_code())
 
 
 ############################################################
@@ -748,6 +924,21 @@ def get_stub(source, *, generic=False):
 ############################################################
 
 
+def _find_spec(mod_name):
+    """Find the spec of a module without importing it.
+
+    Parent packages of a submodule still get imported.
+
+    :sig: (str) -> Optional[importlib.machinery.ModuleSpec]
+    :param mod_name: Name of module to find.
+    :return: Spec of module, or ``None`` if module can not be found.
+    """
+    try:
+        return find_spec(mod_name)
+    except ModuleNotFoundError:
+        return None
+
+
 def get_mod_paths(mod_name):
     """Get source and output file paths of a module.
 
@@ -756,20 +947,47 @@ def get_mod_paths(mod_name):
     :return: Path of source file and subpath in output directory,
         or ``None`` if module can not be found.
     """
-    mod = get_loader(mod_name)
-    if mod is None:
+    spec = _find_spec(mod_name)
+    if spec is None:
         _logger.debug("failed to find module: %s", mod_name)
         return None
 
-    source = getattr(mod, "path", None)  # for pypy3
+    source = spec.origin
     if (source is None) or (not source.endswith(".py")):
         _logger.debug("failed to find python source for module: %s", mod_name)
         return None
 
+    source = Path(source)
     subpath = Path(*mod_name.split("."))
-    if source == "__init__.py":
-        subpath = subpath.joinpath("__init__.py")
-    return Path(source), subpath
+    if source.name == "__init__.py":
+        # same layout as the subpackages found by _walk_pkg_dir
+        subpath = subpath.joinpath("__init__")
+    return source, subpath
+
+
+def _walk_pkg_dir(pkg_dir, subpath):
+    """Get the source and output file paths of modules under a package directory.
+
+    Subdirectories are only searched if they are regular packages.
+    The modules are not imported.
+
+    :sig: (str, Path) -> Iterator[Tuple[Path, Path]]
+    :param pkg_dir: Path of package directory.
+    :param subpath: Subpath of package in output directory.
+    :return: Paths of source file and subpath in output directory for each module.
+    """
+    with os.scandir(pkg_dir) as entries:
+        entries = sorted(entries, key=lambda e: e.name)
+    for entry in entries:
+        if entry.is_dir():
+            init_path = os.path.join(entry.path, "__init__.py")
+            if entry.name.isidentifier() and os.path.isfile(init_path):
+                yield Path(init_path), subpath.joinpath(entry.name, "__init__")
+                yield from _walk_pkg_dir(entry.path, subpath.joinpath(entry.name))
+        elif entry.name.endswith(".py"):
+            mod_name = entry.name[:-3]
+            if mod_name.isidentifier() and (mod_name != "__init__"):
+                yield Path(entry.path), subpath.joinpath(mod_name)
 
 
 def get_pkg_paths(pkg_name):
@@ -779,24 +997,51 @@ def get_pkg_paths(pkg_name):
     :param pkg_name: Name of package to get the module paths for.
     :return: Paths of modules in package.
     """
-    try:
-        pkg = import_module(pkg_name)
-    except ModuleNotFoundError:
-        _logger.debug("failed to load module: %s", pkg_name)
+    spec = _find_spec(pkg_name)
+    if spec is None:
+        _logger.debug("failed to find module: %s", pkg_name)
         return []
 
-    if not hasattr(pkg, "__path__"):
+    if spec.submodule_search_locations is None:
         mod_path = get_mod_paths(pkg_name)
         return [mod_path] if mod_path is not None else []
 
     paths = []
-    for mod_info in walk_packages(pkg.__path__, pkg.__name__ + "."):
-        mod_path = get_mod_paths(mod_info.name)
-        if mod_path is not None:
-            paths.append(mod_path)
+    subpath = Path(*pkg_name.split("."))
+    for pkg_dir in spec.submodule_search_locations:
+        paths.extend(_walk_pkg_dir(pkg_dir, subpath))
     return paths
 
 
+def get_cache_dir():
+    """Get the directory for caching generated stubs across runs.
+
+    :sig: () -> Path
+    :return: Path of cache directory, which might not exist yet.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    if not cache_home:
+        cache_home = os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(cache_home, "pygenstub")
+
+
+def get_cache_key(source, *, generic=False):
+    """Get the key for caching the stub of a source code.
+
+    The key also depends on the versions of pygenstub and Python,
+    since these affect the generated stub.
+
+    :sig: (str, bool) -> str
+    :param source: Source code to generate the stub for.
+    :param generic: Whether to produce generic stubs.
+    :return: Hexadecimal digest of the inputs.
+    """
+    key = hashlib.sha256()
+    key.update(("%s|%s|%s|" % (__version__, sys.version, generic)).encode("utf-8"))
+    key.update(source.encode("utf-8"))
+    return key.hexdigest()
+
+
 ############################################################
 # SPHINX
 ############################################################
@@ -812,10 +1057,9 @@ def process_docstring(app, what, name, obj, options, lines):
     aliases = getattr(app, "_sigaliases", None)
     if aliases is None:
         if what == "module":
-            aliases = get_aliases(inspect.getsource(obj).splitlines())
+            aliases = get_aliases(inspect.getsource(obj))
             app._sigaliases = aliases
 
-    sig_marker = ":" + SIG_FIELD + ":"
     is_class = what in ("class", "exception")
 
     signature = extract_signature("\n".join(lines))
@@ -829,12 +1073,12 @@ def process_docstring(app, what, name, obj, options, lines):
         if len(init_lines) > 1:
             init_doc = textwrap.dedent("\n".join(init_lines[1:]))
             init_lines = init_doc.splitlines()
-        if sig_marker not in init_doc:
+        if _SIG_MARKER not in init_doc:
             return
 
         sig_started = False
         for line in init_lines:
-            if line.lstrip().startswith(sig_marker):
+            if line.lstrip().startswith(_SIG_MARKER):
                 sig_started = True
             if sig_started:
                 lines.append(line)
@@ -843,7 +1087,7 @@ def process_docstring(app, what, name, obj, options, lines):
     if is_class:
         obj = init_method
 
-    param_types, rtype, _ = parse_signature(signature)
+    param_types, rtype, _ = _parse_signature(signature)
     param_names = [p for p in inspect.signature(obj).parameters]
 
     if is_class and (param_names[0] == "self"):
@@ -868,18 +1112,17 @@ def process_docstring(app, what, name, obj, options, lines):
                 break
 
     # remove the signature field
-    sig_start = 0
-    while sig_start < len(lines):
-        if lines[sig_start].startswith(sig_marker):
+    sig_start = None
+    sig_end = len(lines)
+    for i, line in enumerate(lines):
+        if sig_start is None:
+            if line.startswith(_SIG_MARKER):
+                sig_start = i
+        elif not line.startswith(" "):
+            sig_end = i
             break
-        sig_start += 1
-    sig_end = sig_start + 1
-    while sig_end < len(lines):
-        if (not lines[sig_end]) or (lines[sig_end][0] != " "):
-            break
-        sig_end += 1
-    for i in reversed(range(sig_start, sig_end)):
-        del lines[i]
+    if sig_start is not None:
+        del lines[sig_start:sig_end]
 
 
 def setup(app):
@@ -893,9 +1136,12 @@ def setup(app):
 ############################################################
 
 
+@lru_cache(maxsize=1)
 def _make_parser(prog):
     """Create a parser for command line arguments.
 
+    The parser is created once and reused in later calls.
+
     :sig: (str) -> ArgumentParser
     """
     parser = ArgumentParser(prog=prog)
@@ -916,10 +1162,44 @@ def _make_parser(prog):
     parser.add_argument(
         "--generic", action="store_true", default=False, help="generate generic stubs"
     )
+    parser.add_argument(
+        "--cache", action="store_true", default=False, help="reuse stubs from earlier runs"
+    )
+    parser.add_argument(
+        "-u",
+        "--update",
+        action="store_true",
+        default=False,
+        help="skip sources whose stubs are newer than the source",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        metavar="N",
+        help="number of processes to use (default: number of CPUs)",
+    )
     parser.add_argument("--debug", action="store_true", help="enable debug messages")
     return parser
 
 
+def _iter_py_files(root):
+    """Iterate over the Python source files under a directory, recursively.
+
+    :sig: (str) -> Iterator[str]
+    :param root: Path of directory to search.
+    :return: Paths of Python source files.
+    """
+    dirs = [root]
+    while len(dirs) > 0:
+        with os.scandir(dirs.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                elif entry.name.endswith(".py") and entry.is_file():
+                    yield entry.path
+
+
 def _collect_sources(files, modules):
     """Collect the source file paths.
 
@@ -927,10 +1207,10 @@ def _collect_sources(files, modules):
     """
     sources = []
     for path in files:
-        paths = Path(path).glob("**/*.py") if Path(path).is_dir() else [Path(path)]
-        for source in paths:
-            if str(source).startswith(os.path.pardir):
-                source = source.absolute().resolve()
+        if Path(path).parts[:1] == (os.path.pardir,):
+            path = str(Path(path).resolve())
+        paths = _iter_py_files(path) if os.path.isdir(path) else [path]
+        for source in map(Path, paths):
             sources.append((source, source))
 
     for mod_name in modules:
@@ -938,6 +1218,146 @@ def _collect_sources(files, modules):
     return sources
 
 
+def _read_source(source):
+    """Read the code in a source file.
+
+    The file is decoded using its encoding declaration, UTF-8 by default.
+
+    :sig: (Path) -> str
+    :param source: Path of source file.
+    :return: Source code.
+    """
+    return decode_source(source.read_bytes())
+
+
+_generated_stubs = {}  # sig: Dict[str, str]
+
+
+def _write_cached_stub(cached, stub_code):
+    """Write a stub to the cache, without failing if the cache is not writable.
+
+    :sig: (Path, str) -> None
+    :param cached: Path of cache file.
+    :param stub_code: Stub code to cache.
+    """
+    temp = cached.with_name("%s.%d.tmp" % (cached.name, os.getpid()))
+    try:
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        temp.write_text(stub_code, encoding="utf-8")
+        os.replace(temp, cached)
+    except OSError as e:
+        _logger.warning("failed to cache stub to %s: %s", cached, e)
+        try:
+            temp.unlink()
+        except OSError:
+            pass
+
+
+def _generate_stub(source, generic, cache_dir, code=None):
+    """Generate the stub code for a source file.
+
+    Stubs are reused for identical sources within the same process.
+
+    :sig: (Path, bool, Optional[Path], Optional[str]) -> str
+    :param source: Path of source file.
+    :param generic: Whether to produce generic stubs.
+    :param cache_dir: Directory for caching generated stubs, ``None`` to disable.
+    :param code: Source code if already read, ``None`` to read it from the file.
+    :return: Generated stub code.
+    :raise SyntaxError: When source code can not be parsed.
+    :raise ValueError: When signatures or types can not be resolved.
+    """
+    if code is None:
+        code = _read_source(source)
+    key = get_cache_key(code, generic=generic)
+    stub_code = _generated_stubs.get(key)
+    if stub_code is not None:
+        _logger.debug("using stub of identical source for %s", source)
+        return stub_code
+
+    cached = cache_dir / (key + _STUB_SUFFIX) if cache_dir is not None else None
+    if cached is not None:
+        try:
+            stub_code = cached.read_text(encoding="utf-8")
+            _logger.debug("using cached stub for %s", source)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            _logger.warning("failed to read cached stub for %s: %s", source, e)
+
+    if stub_code is None:
+        try:
+            stub_code = get_stub(code, generic=generic)
+        except SyntaxError as e:
+            # name the file, the parser only sees the source code
+            details = (str(source), e.lineno, e.offset, e.text)
+            if getattr(e, "end_lineno", None) is not None:  # python 3.10+
+                details += (e.end_lineno, e.end_offset)
+            raise SyntaxError(e.msg, details) from e
+        except ValueError as e:
+            raise ValueError("%s: %s" % (source, e)) from e
+        if cached is not None:
+            _write_cached_stub(cached, stub_code)
+
+    _generated_stubs[key] = stub_code
+    return stub_code
+
+
+def _generate_stubs(sources, *, generic=False, cache_dir=None, jobs=None):
+    """Generate the stub codes for source files.
+
+    Multiple files are distributed over worker processes.
+
+    :sig: (Sequence[Path], bool, Optional[Path], Optional[int]) -> Iterator[str]
+    :param sources: Paths of source files.
+    :param generic: Whether to produce generic stubs.
+    :param cache_dir: Directory for caching generated stubs, ``None`` to disable.
+    :param jobs: Number of worker processes, ``None`` for the number of CPUs.
+    :return: Generated stub codes, in the order of the source files.
+    """
+    try:
+        yield from _map_generate_stub(sources, generic, cache_dir, jobs)
+    finally:
+        _generated_stubs.clear()
+
+
+def _map_generate_stub(sources, generic, cache_dir, jobs):
+    """Generate the stub codes for source files, in the main process or in workers.
+
+    :sig: (Sequence[Path], bool, Optional[Path], Optional[int]) -> Iterator[str]
+    :param sources: Paths of source files.
+    :param generic: Whether to produce generic stubs.
+    :param cache_dir: Directory for caching generated stubs, ``None`` to disable.
+    :param jobs: Number of worker processes, ``None`` for the number of CPUs.
+    :return: Generated stub codes, in the order of the source files.
+    """
+    if len(sources) < 2:
+        for source in sources:
+            yield _generate_stub(source, generic, cache_dir)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs == 1:
+        # read the next file in the background while generating the current stub
+        with ThreadPoolExecutor(max_workers=1) as reader:
+            next_code = reader.submit(_read_source, sources[0])
+            for i, source in enumerate(sources):
+                code = next_code.result()
+                if i + 1 < len(sources):
+                    next_code = reader.submit(_read_source, sources[i + 1])
+                yield _generate_stub(source, generic, cache_dir, code=code)
+        return
+
+    chunksize = max(len(sources) // (4 * jobs), 1)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(
+            _generate_stub, sources, repeat(generic), repeat(cache_dir), chunksize=chunksize
+        )
+
+
 def run(argv=None):
     """Start the command line interface.
 
@@ -954,6 +1374,9 @@ def run(argv=None):
         logging.basicConfig(level=logging.DEBUG)
         _logger.debug("running in debug mode")
 
+    if (arguments.jobs is not None) and (arguments.jobs < 1):
+        parser.error("number of jobs must be at least 1")
+
     out_dir = arguments.out_dir if arguments.out_dir is not None else ""
 
     if (out_dir == "") and (len(arguments.modules) > 0):
@@ -961,17 +1384,35 @@ def run(argv=None):
         sys.exit(1)
 
     sources = _collect_sources(arguments.files, arguments.modules)
+    out_path = Path(out_dir)
+    targets = []
     for source, subpath in sources:
         if (out_dir != "") and subpath.is_absolute():
             subpath = subpath.relative_to(subpath.root)
-        stub = Path(out_dir, subpath.with_suffix(".pyi"))
-        _logger.info("generating stub for %s to path %s", source, stub)
-        code = source.read_text(encoding="utf-8")
-        stub_code = get_stub(code, generic=arguments.generic)
+        stub = out_path.joinpath(subpath).with_suffix(_STUB_SUFFIX)
+        if arguments.update:
+            try:
+                if stub.stat().st_mtime_ns >= source.stat().st_mtime_ns:
+                    _logger.debug("stub is up to date: %s", stub)
+                    continue
+            except FileNotFoundError:
+                pass
+        targets.append((source, stub))
+
+    stub_codes = _generate_stubs(
+        [source for source, _ in targets],
+        generic=arguments.generic,
+        cache_dir=get_cache_dir() if arguments.cache else None,
+        jobs=arguments.jobs,
+    )
+    stub_dirs = set()
+    for (source, stub), stub_code in zip(targets, stub_codes):
+        _logger.info("generated stub for %s to path %s", source, stub)
         if stub_code != "":
-            if not stub.parent.exists():
-                stub.parent.mkdir(parents=True)
-            stub.write_text("# %s\n\n%s" % (_EDIT_WARNING, stub_code), encoding="utf-8")
+            if stub.parent not in stub_dirs:
+                stub.parent.mkdir(parents=True, exist_ok=True)
+                stub_dirs.add(stub.parent)
+            stub.write_bytes(_EDIT_WARNING_BYTES + stub_code.encode("utf-8"))
 
 
 if __name__ == "__main__":
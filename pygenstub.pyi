@@ -1,19 +1,47 @@
 # THIS FILE IS AUTOMATICALLY GENERATED, DO NOT EDIT.
 
-from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 from argparse import ArgumentParser
 from pathlib import Path
 
 import ast
+import docutils.core
+import importlib.machinery
 
 __version__: str
+_generated_stubs: Dict[str, str]
 
+def _get_publisher() -> docutils.core.Publisher: ...
+def _scan_signature(docstring: str) -> Optional[str]: ...
 def extract_signature(docstring: str) -> Optional[str]: ...
 def _split_types(decl: str) -> List[str]: ...
+def _parse_signature(
+    signature: str
+) -> Tuple[Optional[Tuple[str, ...]], str, FrozenSet[str]]: ...
 def parse_signature(
     signature: str
 ) -> Tuple[Optional[List[str]], str, Set[str]]: ...
+def get_import_from(
+    mod: str,
+    names: Iterable[str],
+    *,
+    indent: str = ...,
+    **config: Dict[str, Any],
+) -> Iterator[str]: ...
 def print_import_from(
     mod: str, names: Set[str], *, indent: str = ..., **config: Dict[str, Any]
 ) -> None: ...
@@ -23,13 +51,13 @@ class StubNode:
     children: List[StubNode]
     def __init__(self) -> None: ...
     def add_child(self, node: StubNode) -> None: ...
-    def get_code(self) -> List[str]: ...
+    def get_code(self) -> Iterator[str]: ...
 
 class VariableNode(StubNode):
     name: str
     type_: str
     def __init__(self, name: str, type_: str) -> None: ...
-    def get_code(self) -> List[str]: ...
+    def get_code(self) -> Iterator[str]: ...
 
 class FunctionNode(StubNode):
     name: str
@@ -45,7 +73,7 @@ class FunctionNode(StubNode):
         *,
         decorators: Optional[Sequence[str]] = ...,
     ) -> None: ...
-    def get_code(self) -> List[str]: ...
+    def get_code(self) -> Iterator[str]: ...
 
 class ClassNode(StubNode):
     name: str
@@ -54,33 +82,74 @@ class ClassNode(StubNode):
     def __init__(
         self, name: str, *, bases: Sequence[str], signature: Optional[str] = ...
     ) -> None: ...
-    def get_code(self) -> List[str]: ...
+    def get_code(self) -> Iterator[str]: ...
 
-def get_aliases(lines: Sequence[str]) -> Dict[str, str]: ...
+def get_aliases(source: str) -> Dict[str, str]: ...
+def get_signature(
+    node: Union[ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef]
+) -> Optional[str]: ...
+def _get_dotted_name(node: Union[ast.Name, ast.Attribute]) -> str: ...
 
 class StubGenerator(ast.NodeVisitor):
     root: StubNode
     generic: bool
     imported_namespaces: Dict[str, str]
     imported_names: Dict[str, str]
+    _imported_locals: Dict[str, str]
+    _namespace_aliases: Dict[str, str]
     defined_types: Set[str]
     required_types: Set[str]
+    module_vars: Set[str]
     aliases: Dict[str, str]
-    _parents: List[StubNode]
-    _code_lines: List[str]
+    _parent: StubNode
+    _source: str
+    _has_sig_comments: bool
+    _line_starts: Optional[List[int]]
+    _visitors: Dict[type, Callable[[ast.AST], None]]
     def __init__(self, source: str, *, generic: bool = ...) -> None: ...
     def collect_aliases(self) -> None: ...
+    def get_line(self, lineno: int) -> str: ...
     def get_function_node(
         self, node: Union[ast.FunctionDef, ast.AsyncFunctionDef]
     ) -> Optional[FunctionNode]: ...
     def analyze_types(self) -> Dict[str, Set[str]]: ...
+    def get_code(self) -> Iterator[str]: ...
     def print_stub(self) -> None: ...
 
+def _may_have_stub(source: str) -> bool: ...
 def get_stub(source: str, *, generic: bool = ...) -> str: ...
+def _find_spec(mod_name: str) -> Optional[importlib.machinery.ModuleSpec]: ...
 def get_mod_paths(mod_name: str) -> Optional[Tuple[Path, Path]]: ...
+def _walk_pkg_dir(
+    pkg_dir: str, subpath: Path
+) -> Iterator[Tuple[Path, Path]]: ...
 def get_pkg_paths(pkg_name: str) -> List[Tuple[Path, Path]]: ...
+def get_cache_dir() -> Path: ...
+def get_cache_key(source: str, *, generic: bool = ...) -> str: ...
 def _make_parser(prog: str) -> ArgumentParser: ...
+def _iter_py_files(root: str) -> Iterator[str]: ...
 def _collect_sources(
     files: List[str], modules: List[str]
 ) -> List[Tuple[Path, Path]]: ...
+def _read_source(source: Path) -> str: ...
+def _write_cached_stub(cached: Path, stub_code: str) -> None: ...
+def _generate_stub(
+    source: Path,
+    generic: bool,
+    cache_dir: Optional[Path],
+    code: Optional[str] = ...,
+) -> str: ...
+def _generate_stubs(
+    sources: Sequence[Path],
+    *,
+    generic: bool = ...,
+    cache_dir: Optional[Path] = ...,
+    jobs: Optional[int] = ...,
+) -> Iterator[str]: ...
+def _map_generate_stub(
+    sources: Sequence[Path],
+    generic: bool,
+    cache_dir: Optional[Path],
+    jobs: Optional[int],
+) -> Iterator[str]: ...
 def run(argv: Optional[List[str]] = ...) -> None: ...
@@ -83,6 +83,82 @@ def test_multiple_input_files_should_produce_multiple_stub_files():
     assert os.path.exists("example1.pyi") and os.path.exists("example2.pyi")
 
 
+def test_multiple_input_files_should_produce_multiple_stub_files_in_single_job():
+    assert (not os.path.exists("example1.pyi")) and (not os.path.exists("example2.pyi"))
+    pygenstub.run(["pygenstub", "-j", "1", "example1.py", "example2.py"])
+    assert os.path.exists("example1.pyi") and os.path.exists("example2.pyi")
+
+
+def test_stubs_generated_before_a_failing_source_should_be_written():
+    with open("bad.py", "w") as f:
+        f.write("x = (  # sig: int\n")
+    with raises(SyntaxError):
+        pygenstub.run(["pygenstub", "-j", "1", "example1.py", "bad.py"])
+    os.unlink("bad.py")
+    assert os.path.exists("example1.pyi")
+
+
+def test_failing_source_should_be_named_in_error():
+    with open("bad.py", "w") as f:
+        f.write("x = 1  # sig: int\ny = (1 +)\n")
+    with raises(SyntaxError) as e:
+        pygenstub.run(["pygenstub", "example1.py", "bad.py"])
+    os.unlink("bad.py")
+    assert (e.value.filename, e.value.lineno) == ("bad.py", 2)
+    if sys.version_info >= (3, 10):
+        assert e.value.end_lineno == 2
+
+
+def test_source_with_unresolved_types_should_be_named_in_error():
+    with open("bad.py", "w") as f:
+        f.write("x = 1  # sig: Foo\n")
+    with raises(ValueError) as e:
+        pygenstub.run(["pygenstub", "example1.py", "bad.py"])
+    os.unlink("bad.py")
+    assert str(e.value).startswith("bad.py: ")
+
+
+def test_if_number_of_jobs_not_positive_should_print_error(capsys):
+    with raises(SystemExit):
+        pygenstub.run(["pygenstub", "-j", "0", "example1.py"])
+    out, err = capsys.readouterr()
+    assert "number of jobs must be at least 1" in err
+
+
+def test_input_directory_should_produce_stub_files_for_all_sources_in_hierarchy():
+    os.makedirs(os.path.join("pkg", "sub"))
+    shutil.copyfile("example1.py", os.path.join("pkg", "sub", "example.py"))
+    pygenstub.run(["pygenstub", "pkg"])
+    assert os.path.exists(os.path.join("pkg", "sub", "example.pyi"))
+    shutil.rmtree("pkg")
+
+
+def test_source_file_should_be_decoded_using_encoding_declaration():
+    with open("latin.py", "wb") as f:
+        f.write("# -*- coding: latin-1 -*-\ns = 'ç'  # sig: str\n".encode("latin-1"))
+    pygenstub.run(["pygenstub", "latin.py"])
+    with open("latin.pyi") as f:
+        assert f.read().endswith("s: str\n")
+    os.unlink("latin.py")
+
+
+def test_update_should_skip_stub_newer_than_source():
+    with open("example1.pyi", "w") as f:
+        f.write("x: int\n")
+    pygenstub.run(["pygenstub", "--update", "example1.py"])
+    with open("example1.pyi") as f:
+        assert f.read() == "x: int\n"
+
+
+def test_update_should_regenerate_stub_older_than_source():
+    with open("example1.pyi", "w") as f:
+        f.write("x: int\n")
+    os.utime("example1.pyi", (0, 0))
+    pygenstub.run(["pygenstub", "--update", "example1.py"])
+    with open("example1.pyi") as f:
+        assert f.read().endswith("answer: int\n")
+
+
 def test_input_absolute_path_should_produce_stub_file_next_to_source(source_root):
     os.chdir(os.path.dirname(__file__))
     source = os.path.join(source_root, "example1.py")
@@ -92,6 +168,15 @@ def test_input_absolute_path_should_produce_stub_file_next_to_source(source_root
     assert os.path.exists(stub)
 
 
+def test_input_parent_relative_path_should_produce_stub_file_next_to_source(source_root):
+    os.mkdir("sub")
+    os.chdir("sub")
+    pygenstub.run(["pygenstub", os.path.join(os.path.pardir, "example1.py")])
+    os.chdir(source_root)
+    os.rmdir("sub")
+    assert os.path.exists("example1.pyi")
+
+
 def test_stub_file_should_be_saved_in_given_output_directory():
     assert not os.path.exists("typeshed")
     os.mkdir("typeshed")
@@ -105,6 +190,15 @@ def test_output_directory_should_be_created_if_necessary():
     assert os.path.exists(os.path.join("typeshed", "example1.pyi"))
 
 
+def test_output_directory_should_not_be_created_for_sources_without_stub():
+    os.makedirs(os.path.join("nostub", "sub"))
+    with open(os.path.join("nostub", "sub", "m.py"), "w") as f:
+        f.write("x = 1\n")
+    pygenstub.run(["pygenstub", os.path.join("nostub", "sub", "m.py"), "-o", "typeshed"])
+    shutil.rmtree("nostub")
+    assert not os.path.exists("typeshed")
+
+
 def test_input_absolute_path_should_generate_stub_file_in_given_output_directory(source_root):
     os.chdir(os.path.dirname(__file__))
     source = os.path.join(source_root, "example1.py")
@@ -136,3 +230,38 @@ def test_module_stub_generation_should_work_for_multiple_file_module():
     assert os.path.exists(os.path.join("typeshed", "logging", "config.pyi")) and os.path.exists(
         os.path.join("typeshed", "logging", "handlers.pyi")
     )
+
+
+def test_cached_stub_should_be_reused_for_unchanged_source(monkeypatch, source_root):
+    monkeypatch.setenv("XDG_CACHE_HOME", os.path.join(source_root, "cache"))
+    pygenstub.run(["pygenstub", "--cache", "example1.py"])
+    cached = glob(os.path.join(source_root, "cache", "pygenstub", "*.pyi"))
+    assert len(cached) == 1
+    with open(cached[0], "w") as f:
+        f.write("x: int\n")
+    pygenstub.run(["pygenstub", "--cache", "example1.py"])
+    with open("example1.pyi") as f:
+        assert f.read().endswith("x: int\n")
+
+
+def test_unwritable_cache_should_not_stop_stub_generation(monkeypatch, source_root):
+    cache_home = os.path.join(source_root, "cache_file")
+    with open(cache_home, "w"):
+        pass
+    monkeypatch.setenv("XDG_CACHE_HOME", cache_home)
+    pygenstub.run(["pygenstub", "--cache", "example1.py"])
+    os.unlink(cache_home)
+    assert os.path.exists("example1.pyi")
+
+
+def test_unreadable_cache_entry_should_be_regenerated(monkeypatch, source_root):
+    monkeypatch.setenv("XDG_CACHE_HOME", os.path.join(source_root, "cache_dirs"))
+    pygenstub.run(["pygenstub", "--cache", "example1.py"])
+    cached = glob(os.path.join(source_root, "cache_dirs", "pygenstub", "*.pyi"))[0]
+    os.unlink(cached)
+    os.mkdir(cached)
+    os.unlink("example1.pyi")
+    pygenstub.run(["pygenstub", "--cache", "example1.py"])
+    assert os.path.exists("example1.pyi")
+    assert glob(os.path.join(source_root, "cache_dirs", "pygenstub", "*.tmp")) == []
+    shutil.rmtree(os.path.join(source_root, "cache_dirs"))
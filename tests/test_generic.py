@@ -1,3 +1,5 @@
+from pathlib import Path
+
 from pygenstub import get_mod_paths, get_pkg_paths
 
 
@@ -5,10 +7,19 @@ def test_get_mod_source_should_return_python_file_path():
     assert get_mod_paths("subprocess")[0].name == "subprocess.py"
 
 
+def test_get_mod_source_should_return_init_file_path_for_package():
+    source, subpath = get_mod_paths("email.mime")
+    assert (source.name, subpath) == ("__init__.py", Path("email", "mime", "__init__"))
+
+
 def test_get_mod_source_should_return_none_if_module_not_found():
     assert get_mod_paths("foo") is None
 
 
+def test_get_mod_source_should_return_none_if_parent_package_not_found():
+    assert get_mod_paths("foo.bar") is None
+
+
 def test_get_mod_source_should_return_none_if_source_is_not_python():
     assert get_mod_paths("math") is None
 
@@ -17,6 +28,11 @@ def test_get_pkg_sources_should_return_python_file_paths():
     assert [p[0].name for p in get_pkg_paths("logging")] == ["config.py", "handlers.py"]
 
 
+def test_get_pkg_sources_should_return_init_file_paths_for_subpackages():
+    paths = {subpath: source.name for source, subpath in get_pkg_paths("email")}
+    assert paths[Path("email", "mime", "__init__")] == "__init__.py"
+
+
 def test_get_pkg_sources_should_return_python_mod_path_for_single_file_package():
     assert [p[0].name for p in get_pkg_paths("subprocess")] == ["subprocess.py"]
 
@@ -27,3 +43,12 @@ def test_get_pkg_sources_should_return_empty_list_if_module_not_found():
 
 def test_get_pkg_sources_should_return_empty_list_if_no_python_sources_found():
     assert get_pkg_paths("math") == []
+
+
+def test_get_pkg_sources_should_not_import_package(tmp_path, monkeypatch):
+    pkg_dir = tmp_path / "pygenstub_test_pkg"
+    pkg_dir.mkdir()
+    pkg_dir.joinpath("__init__.py").write_text("raise RuntimeError\n")
+    pkg_dir.joinpath("mod.py").write_text("")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    assert [p[0].name for p in get_pkg_paths("pygenstub_test_pkg")] == ["mod.py"]
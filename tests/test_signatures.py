@@ -11,6 +11,18 @@ def test_extract_signature_should_return_none_if_no_sig_field():
     assert extract_signature("foo\n\n:param a: b\n") is None
 
 
+def test_extract_signature_should_return_value_of_multiline_sig_field():
+    assert extract_signature("foo\n\n:sig: (str)\n    -> None\n") == "(str)\n-> None"
+
+
+def test_extract_signature_should_return_none_if_sig_field_in_literal_block():
+    assert extract_signature("foo::\n\n    :sig: () -> None\n") is None
+
+
+def test_extract_signature_should_return_none_if_sig_field_in_paragraph():
+    assert extract_signature("foo\n:sig: () -> None\n") is None
+
+
 def test_extract_signature_should_raise_error_if_multiple_sig_fields():
     with raises(ValueError):
         extract_signature("foo\n\n:sig: () -> None\n:sig: () -> None\n")
@@ -70,6 +82,15 @@ def test_parse_signature_should_consider_components_of_nested_bracketed_types_as
     }
 
 
+def test_parse_signature_should_not_consider_numbers_as_required_types():
+    assert parse_signature("(Tuple[int, str]) -> Literal[1, 2.5]")[2] == {
+        "Tuple",
+        "int",
+        "str",
+        "Literal",
+    }
+
+
 def test_parse_signature_should_treat_signature_as_variable_type_comment_if_no_arrow():
     assert parse_signature("int") == (None, "int", {"int"})
 
@@ -78,6 +99,13 @@ def test_parse_signature_should_correctly_handle_multiline_signature():
     assert parse_signature("(\n  str\n) -> int") == (["str"], "int", {"str", "int"})
 
 
+def test_parse_signature_should_not_share_results_between_calls():
+    param_types, _, requires = parse_signature("(str) -> int")
+    param_types.insert(0, "")
+    requires.add("bool")
+    assert parse_signature("(str) -> int") == (["str"], "int", {"str", "int"})
+
+
 def test_parse_signature_should_raise_error_if_multiple_arrows():
     with raises(ValueError):
         parse_signature("() -> None -> int")
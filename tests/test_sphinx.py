@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+
+from pygenstub import process_docstring
+
+
+def f(a, b):
+    """Do foo.
+
+    :sig: (int, str) -> bool
+    :param a: First.
+    :param b: Second.
+    :return: Result.
+    """
+
+
+def get_lines(func):
+    return func.__doc__.replace("\n    ", "\n").splitlines()
+
+
+def test_process_docstring_should_insert_parameter_and_return_types():
+    lines = get_lines(f)
+    process_docstring(SimpleNamespace(_sigaliases={}), "function", "f", f, {}, lines)
+    assert lines == [
+        "Do foo.",
+        "",
+        ":type a: int",
+        ":param a: First.",
+        ":type b: str",
+        ":param b: Second.",
+        ":rtype: bool",
+        ":return: Result.",
+    ]
+
+
+def test_process_docstring_should_remove_multiline_signature_field():
+    lines = get_lines(f)
+    lines[2:3] = [":sig: (", "    int, str", "  ) -> bool"]
+    process_docstring(SimpleNamespace(_sigaliases={}), "function", "f", f, {}, lines)
+    assert ":sig:" not in "\n".join(lines)
+    assert lines[2:4] == [":type a: int", ":param a: First."]
+
+
+def test_process_docstring_should_use_aliases_for_parameter_types():
+    lines = get_lines(f)
+    process_docstring(SimpleNamespace(_sigaliases={"int": "Foo"}), "function", "f", f, {}, lines)
+    assert lines[2] == ":type a: *int* :sup:`Foo`"
@@ -2,7 +2,7 @@ from pytest import raises
 
 from io import StringIO
 
-from pygenstub import get_stub
+from pygenstub import StubGenerator, get_stub
 
 
 _INDENT = " " * 4
@@ -57,6 +57,10 @@ def test_if_no_sig_then_stub_should_be_empty():
     assert get_stub(code) == ""
 
 
+def test_if_no_sig_then_source_should_not_be_parsed():
+    assert get_stub("def f(:\n") == ""
+
+
 def test_if_returns_none_then_stub_should_return_none():
     code = get_function("f", rtype="None")
     assert get_stub(code) == "def f() -> None: ...\n"
@@ -103,17 +107,68 @@ def test_if_returns_from_imported_qualified_then_stub_should_include_import():
     assert get_stub(code) == "from x import y\n\ndef f() -> y.A: ...\n"
 
 
+def test_if_uses_multiple_imported_from_same_module_then_stub_should_group_imports():
+    code = "from x import B\nfrom y import C\nfrom x import A\n"
+    code += "\n\n" + get_function("f", params=["a", "c"], ptypes=["A", "C"], rtype="B")
+    assert get_stub(code) == (
+        "from x import A, B\nfrom y import C\n\ndef f(a: A, c: C) -> B: ...\n"
+    )
+
+
+def test_if_uses_plain_and_renamed_imported_from_same_module_then_stub_should_not_separate():
+    code = "from x import A, B as C\n"
+    code += "\n\n" + get_function("f", params=["a"], ptypes=["A"], rtype="C")
+    assert get_stub(code) == (
+        "from x import A\nfrom x import B as C\n\ndef f(a: A) -> C: ...\n"
+    )
+
+
+def test_if_uses_multiple_renamed_imported_from_same_module_then_stub_should_keep_order():
+    code = "from x import Z as Y, A, G as H, C as D\n"
+    code += "\n\n" + get_function(
+        "f", params=["a", "d", "h"], ptypes=["A", "D", "H"], rtype="Y"
+    )
+    assert get_stub(code) == (
+        "from x import A\n"
+        "from x import Z as Y\n"
+        "from x import G as H\n"
+        "from x import C as D\n"
+        "\n"
+        "def f(a: A, d: D, h: H) -> Y: ...\n"
+    )
+
+
 def test_if_returns_relative_imported_qualified_then_stub_should_include_import():
     code = "from . import x\n"
     code += "\n\n" + get_function("f", rtype="x.A")
     assert get_stub(code) == "from . import x\n\ndef f() -> x.A: ...\n"
 
 
+def test_if_returns_relative_submodule_imported_then_stub_should_include_import():
+    code = "from ..x import A\n"
+    code += "\n\n" + get_function("f", rtype="A")
+    assert get_stub(code) == "from ..x import A\n\ndef f() -> A: ...\n"
+
+
+def test_if_returns_multiline_imported_then_stub_should_include_import():
+    code = "from importlib import (\n    A,\n)\n"
+    code += "\n\n" + get_function("f", rtype="A")
+    assert get_stub(code) == "from importlib import A\n\ndef f() -> A: ...\n"
+
+
 def test_if_returns_unimported_qualified_then_stub_should_generate_import():
     code = get_function("f", rtype="x.y.A")
     assert get_stub(code) == "import x.y\n\ndef f() -> x.y.A: ...\n"
 
 
+def test_if_returns_qualified_on_module_variable_then_stub_should_not_generate_import():
+    code = "x = ...  # sig: Any\n"
+    code += "\n\n" + get_function("f", rtype="x.A")
+    assert get_stub(code) == (
+        "from typing import Any\n\nx: Any\n\ndef f() -> x.A: ...\n"
+    )
+
+
 def test_if_returns_imported_typing_then_stub_should_include_import():
     code = "from typing import List\n"
     code += "\n\n" + get_function("f", rtype="List")
@@ -226,6 +281,11 @@ def test_if_param_has_default_then_stub_should_include_ellipses():
     )
 
 
+def test_if_last_params_have_defaults_then_stub_should_include_ellipses():
+    code = get_function("f", params=["i", "j=0", "k=1"], ptypes=["int", "int", "int"], rtype="None")
+    assert get_stub(code) == "def f(i: int, j: int = ..., k: int = ...) -> None: ...\n"
+
+
 def test_stub_should_ignore_varargs_type():
     code = get_function("f", params=["i", "*args"], ptypes=["int"], rtype="None")
     assert get_stub(code) == "def f(i: int, *args) -> None: ...\n"
@@ -415,11 +475,31 @@ def test_get_stub_comment_instance_variable():
     assert get_stub(code) == "class C:\n    a: int\n    def m(self) -> None: ...\n"
 
 
+def test_get_stub_should_ignore_sig_comment_in_string():
+    code = 's = "# sig: int"\n'
+    assert get_stub(code) == ""
+
+
+def test_get_stub_should_use_sig_comment_after_string():
+    code = 's = "# sig: int"  # sig: str\n'
+    assert get_stub(code) == "s: str\n"
+
+
+def test_get_stub_comment_module_variable_after_form_feed():
+    code = "\x0c\nn = 42  # sig: int\n"
+    assert get_stub(code) == "n: int\n"
+
+
 def test_stub_should_use_alias_comment():
     code = "# sigalias: B = int\n\nn = 42  # sig: B\n" ""
     assert get_stub(code) == "B = int\n\nn: B\n"
 
 
+def test_stub_should_use_multiple_alias_comments():
+    code = "# sigalias: B = int\n    # sigalias: C = str  \n\nn = 42  # sig: B\n"
+    assert get_stub(code) == "B = int\nC = str\n\nn: B\n"
+
+
 def test_stub_should_exclude_function_without_sig():
     code = get_function("f", rtype="None")
     code += "\n\n" + get_function("g", desc="")
@@ -433,3 +513,9 @@ def test_get_stub_typing_import_should_come_first():
         get_stub(code)
         == "from typing import List\n\nfrom x import A\n\ndef f(a: A, l: List) -> None: ...\n"
     )
+
+
+def test_print_stub_should_print_the_stub_code(capsys):
+    code = get_function("f", params=["a", "l"], ptypes=["int", "List"], rtype="None")
+    StubGenerator(code).print_stub()
+    assert capsys.readouterr().out == get_stub(code)